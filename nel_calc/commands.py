@@ -3,8 +3,10 @@ import sys
 import json
 import csv
 import pathlib
+import datetime
 
 import pylinac.calibration.trs398
+import pylinac.core.image
 import pylinac.core.image_generator.layers
 import pylinac
 import click
@@ -14,6 +16,8 @@ import matplotlib.pyplot as plt
 import nel_calc.nel_config
 import nel_calc.nel_aux
 import nel_calc.customSim
+import nel_calc.nel_history
+import nel_calc.nel_gamma
 
 def validate_config_path_exclusive_option(ctx, param, value):
     """Validate that config_path is not used with other options."""
@@ -43,6 +47,43 @@ def validate_mutually_exclusive_options(ctx, param, value):
             
     return value
 
+def load_config(filename):
+    """Load the compiled config file; invalid JSON or config stops the command with every error found."""
+    try:
+        return nel_calc.nel_config.LoadConfig(filename)
+    except ValueError as error:
+        raise click.ClickException(f"Invalid config file {filename}:\n{error}")
+
+def resolve_history(history, configData, device, deviceType):
+    """Find the history database and the device recorded in it, before any processing.
+    The filename is None when no history is recorded, by option or config file."""
+    historyTarget = {"filename": history, "batch_size": nel_calc.nel_history.default_batch_size, "device": device}
+    if configData is not None and configData.history:
+        historyTarget["batch_size"] = configData.history.get("batch_size", historyTarget["batch_size"])
+        if historyTarget["filename"] is None:
+            historyTarget["filename"] = configData.GetHistoryFilename()
+    if historyTarget["filename"] is None:
+        return historyTarget
+
+    if historyTarget["device"] is None and configData is not None:
+        default_device = configData.GetDefaultDevice(deviceType)
+        if default_device is not None:
+            historyTarget["device"] = default_device["name"]
+    if historyTarget["device"] is None:
+        raise click.BadParameter(f"A device is required to record results in the history database, or a default {deviceType} in the config file.", param_hint="--device")
+    return historyTarget
+
+def record_history(historyTarget, results, chamber, energy, date, command, source):
+    """Append the results to the history database found by resolve_history, if any."""
+    if historyTarget["filename"] is None:
+        return 0
+
+    count = nel_calc.nel_history.RecordResults(filename=historyTarget["filename"], results=results, device=historyTarget["device"],
+                                               chamber=chamber, energy=energy, date=date, command=command, source=source,
+                                               batch_size=historyTarget["batch_size"])
+    click.echo(f"{count} results recorded in history {historyTarget['filename']}.")
+    return count
+
 program_folder = pathlib.Path(__file__).parent.parent.resolve()
 samples_folder = program_folder / nel_calc.nel_config.foldernames["samples"]
 
@@ -66,6 +107,15 @@ def create_config(filename):
     
     sys.exit(0)
 
+#command to check a config file
+@click.command()
+@click.argument("filename", type=click.Path(exists=True, file_okay=True, dir_okay=False), required=True)
+def check_config(filename):
+    """Validate a config file."""
+    configData = load_config(filename)
+    click.echo(f"Config file {filename} is valid: {len(configData.quantities)} quantities, {len(configData.devices)} devices.")
+    sys.exit(0)
+
 #command to create image for 2D profiling
 @click.command()
 @click.argument("filename", type=click.Path(file_okay=True, dir_okay=False), required=True)
@@ -79,22 +129,18 @@ def create_image_planar(filename, field_size_mm, sigma_mm, gantry_angle, epid, c
 
     # Load the config file.
     if config:
-        with open(config, "r", encoding = "utf-8") as configFile:
-            configJSON = json.load(configFile)
+        configData = load_config(config)
     
-        field_size_mm=configJSON["images"]["symmetry"]["FilteredFieldLayer"]["field_size_mm"]
-        sigma_mm=configJSON["images"]["symmetry"]["GaussianFilterLayer"]["sigma_mm"]
-        gantry_angle=configJSON["images"]["symmetry"]["generate_dicom"]["gantry_angle"]
-        for device in configJSON["devices"]:
-            if configJSON["devices"][device]["type"] == "epid":
-                deviceStatus = configJSON["devices"][device]["status"]
-                if "default" in deviceStatus:
-                    epid = configJSON["devices"][device]["name"]
-                    break
-                else:
-                    raise LookupError("No default EPID found in the config file.")
-            else:
-                raise KeyError("No EPID found in the config file.")
+        symmetry = configData.images["symmetry"]
+        field_size_mm=symmetry["FilteredFieldLayer"]["field_size_mm"]
+        sigma_mm=symmetry["GaussianFilterLayer"]["sigma_mm"]
+        gantry_angle=symmetry["generate_dicom"]["gantry_angle"]
+        if "epid" not in configData.devices_by_type:
+            raise KeyError("No EPID found in the config file.")
+        default_epid = configData.GetDefaultDevice("epid")
+        if default_epid is None:
+            raise LookupError("No default EPID found in the config file.")
+        epid = default_epid["name"]
     else:
         #Check if all the parameters are provided.
         if field_size_mm is None or sigma_mm is None or gantry_angle is None or epid is None:
@@ -138,27 +184,34 @@ def create_calibration(filename):
 @click.option("--filetype", type=click.STRING, help="FileType of the input and output files.")
 @click.option("--summary", type=click.Path(exists=False, file_okay=True), help="FileName of summary file.")
 @click.option("--config", type=click.Path(exists=True, file_okay=True), help="Config filename.")
-def analyze_preliminary(config, input_dir, output_dir, input_preffix, output_preffix, filetype, summary):
+@click.option("--history", type=click.Path(file_okay=True, dir_okay=False), help="History database filename.")
+@click.option("--device", type=click.STRING, help="Device name recorded in history. Default LINAC from config if omitted.")
+@click.option("--chamber", type=click.STRING, help="Ionization chamber recorded in history.")
+@click.option("--energy", type=float, help="Beam energy recorded in history.")
+@click.option("--date", type=click.DateTime(formats=["%Y-%m-%d"]), help="Measurement date recorded in history. Today if omitted.")
+def analyze_preliminary(config, input_dir, output_dir, input_preffix, output_preffix, filetype, summary, history, device, chamber, energy, date):
     """Analyze calibration preliminary data about measurements."""
 
     # Load the config file.
-    with open(config, "r", encoding = "utf-8") as configFile:
-        configJSON = json.load(configFile)
+    configData = load_config(config)
+
+    # History database and device, checked before writing any output.
+    historyTarget = resolve_history(history, configData, device, "linac")
 
     # Base types for the quantities.
-    default_baseTypes = nel_calc.nel_aux.GetBaseTypes(configJSON["quantities"])
+    default_baseTypes = configData.baseTypes
 
     #Obtaining the units that will be used in the output files.
-    new_input_units = {key: configJSON["quantities"][key]["unit"] for key in configJSON["files"]["input_preliminary"]["header"]}
-    output_header = configJSON["files"]["output_preliminary"]["header"]
-    old_output_units = {key: configJSON["quantities"][key]["unit"] for key in output_header}
+    new_input_units = configData.GetUnits(configData.files["input_preliminary"]["header"])
+    output_header = configData.files["output_preliminary"]["header"]
+    old_output_units = configData.GetUnits(output_header)
 
     # Filenames for the output files.
     #summary = f"{configJSON["files"]["summary"]["preffix"]}.{configJSON["files"]["summary"]["extension"]}"
     #output_preffix = f"{configJSON["files"]["output_preliminary"]["preffix"]}"
 
     #limits
-    max_PTP = configJSON["limits"]["PTP"]["max"]
+    max_PTP = configData.limits["PTP"]["max"]
 
     # Getting the input filenames.
     input_suffix = f".{filetype}"
@@ -272,6 +325,14 @@ def analyze_preliminary(config, input_dir, output_dir, input_preffix, output_pre
         json.dump(output_quantities, summaryFile, indent=4)
         print(f"Output file {summary} created.")
 
+    # Record the results in the history database.
+    history_results = output_quantities.copy()
+    history_results["k_TP_average"] = nel_calc.nel_aux.FindAverage([measurement["k_TP"] for measurement_list in measurement_list_tries for measurement in measurement_list])
+    record_history(historyTarget, results=history_results,
+                   chamber=chamber, energy=energy,
+                   date=date.date().isoformat() if date else None,
+                   command="analyze-preliminary", source=str(pathlib.Path(input_dir).resolve()))
+
     click.echo("Preliminary analysis done.")
     sys.exit(0)
 
@@ -280,30 +341,35 @@ def analyze_preliminary(config, input_dir, output_dir, input_preffix, output_pre
 @click.option("--protocol", type=click.STRING, callback=validate_config_path_exclusive_option, help="Protocol used for calculations.")
 @click.option("--output", type=click.Path(file_okay=True, dir_okay=False), callback=validate_config_path_exclusive_option, help="Output analysis filename.")
 @click.option("--config", type=click.Path(exists=True, file_okay=True), callback=validate_config_path_exclusive_option, help="Config filename.")
-def analyze_image_planar(filename, protocol, output, config):
+@click.option("--history", type=click.Path(file_okay=True, dir_okay=False), help="History database filename.")
+@click.option("--device", type=click.STRING, help="EPID name recorded in history. Default EPID from config if omitted.")
+@click.option("--energy", type=float, help="Beam energy recorded in history.")
+@click.option("--date", type=click.DateTime(formats=["%Y-%m-%d"]), help="Acquisition date recorded in history. Today if omitted.")
+def analyze_image_planar(filename, protocol, output, config, history, device, energy, date):
     """Analyze field images."""
 
+    configData = None
     if config:
         # Load the config file.
-        with open(config, "r", encoding = "utf-8") as configFile:
-            configJSON = json.load(configFile)
+        configData = load_config(config)
 
         # Output filename.
-        output = f"{configJSON["files"]["output-image-analysis"]["preffix"]}.{configJSON["files"]["output-image-analysis"]["extension"]}"
+        output_file = configData.files["output-image-analysis"]
+        output = f"{output_file['preffix']}.{output_file['extension']}"
 
         protocol = None
-        for configJSON_device in configJSON["devices"]:
-            if configJSON["devices"][configJSON_device]["type"] == "epid":
-                deviceStatus = configJSON["devices"][configJSON_device]["status"]
-                if "default" in deviceStatus:
-                    protocol = configJSON["devices"][configJSON_device]["protocol"]
-                    break
+        default_epid = configData.GetDefaultDevice("epid")
+        if default_epid is not None:
+            protocol = default_epid["protocol"]
 
     else:
         #Check if all the parameters are provided.
         if protocol is None or output is None:
             raise click.BadParameter("All parameters are required.")
 
+    # History database and device, checked before any analysis.
+    historyTarget = resolve_history(history, configData, device, "epid")
+
     # Load input files: field images
     field_analysis = pylinac.FieldAnalysis(path=filename)
     
@@ -323,6 +389,16 @@ def analyze_image_planar(filename, protocol, output, config):
     field_analysis.analyze(protocol=protocol_class)
     field_analysis.plot_analyzed_image()
     field_analysis.publish_pdf(filename=output)
+
+    # Record the results in the history database.
+    # Protocol results (symmetry, flatness) are flattened next to the field geometry results.
+    results_data = field_analysis.results_data(as_dict=True)
+    history_results = dict(results_data)
+    history_results.update(results_data.get("protocol_results", {}))
+    record_history(historyTarget, results=history_results,
+                   chamber=None, energy=energy,
+                   date=date.date().isoformat() if date else None,
+                   command="analyze-image-planar", source=str(pathlib.Path(filename).resolve()))
     
     click.echo(f"2D images analyzed.")
     sys.exit(0)
@@ -331,16 +407,26 @@ def analyze_image_planar(filename, protocol, output, config):
 @click.argument("filename", type=click.Path(file_okay=True, dir_okay=False), required=True)
 @click.option("--output", type=click.Path(file_okay=True, dir_okay=False), help="Output filename.")
 @click.option("--config", type=click.Path(exists=True, file_okay=True), help="Config filename.")
-def generate_calibration_report(filename, output, config):
+@click.option("--history", type=click.Path(file_okay=True, dir_okay=False), help="History database filename.")
+@click.option("--device", type=click.STRING, help="Device name recorded in history. Default LINAC from config if omitted.")
+def generate_calibration_report(filename, output, config, history, device):
     """Generate report about calibration."""
 
     # Load the config file.
-    with open(config, "r", encoding = "utf-8") as configFile:
-        configJSON = json.load(configFile)
+    configData = load_config(config)
     
     # Load the input file.
     with open(filename, "r", encoding = "utf-8") as inputFile:
         inputJSON = json.load(inputFile)
+
+    # History database and device, checked before building the report.
+    # Only history needs ISO 8601 dates, for its date ranges and trends.
+    historyTarget = resolve_history(history, configData, device, "linac")
+    if historyTarget["filename"] is not None:
+        try:
+            measurement_date = datetime.date.fromisoformat(str(inputJSON["measurement_date"])).isoformat()
+        except ValueError:
+            raise click.BadParameter(f"measurement_date must be an ISO date (YYYY-MM-DD) to record history: {inputJSON['measurement_date']}.", param_hint="filename")
         
     trs398_calculator = pylinac.calibration.trs398.TRS398Photon(
         chamber=inputJSON["chamber"],
@@ -372,6 +458,22 @@ def generate_calibration_report(filename, output, config):
         open_file=False
         )
     click.echo(f"Output file {output} created.")
+
+    # Record the results in the history database.
+    if historyTarget["filename"] is not None:
+        history_results = {
+            "k_tp": trs398_calculator.k_tp,
+            "k_pol": trs398_calculator.k_pol,
+            "k_s": trs398_calculator.k_s,
+            "kq": trs398_calculator.kq,
+            "m_corrected": trs398_calculator.m_corrected,
+            "dose_mu_zref": trs398_calculator.dose_mu_zref,
+            "dose_mu_zmax": trs398_calculator.dose_mu_zmax
+        }
+        record_history(historyTarget, results=history_results,
+                       chamber=str(inputJSON["chamber"]), energy=inputJSON["energy"],
+                       date=measurement_date,
+                       command="generate-calibration-report", source=str(pathlib.Path(filename).resolve()))
     sys.exit(0)
 
 @click.command()
@@ -382,34 +484,216 @@ def generate_graph(csv_file, output, config):
     """Generates a graph from a given CSV file."""
     
     # Load the config file.
-    with open(config, "r", encoding="utf-8") as configFile:
-        configJSON = json.load(configFile)
+    pdd_graph = load_config(config).pdd_graph
 
     # Load data
     df = pd.read_csv(csv_file)
 
     # Assuming the first column is X and the second is Y
-    plt.figure(figsize=(configJSON["pdd_graph"]["figsize"]["x"], configJSON["pdd_graph"]["figsize"]["y"]))
+    plt.figure(figsize=(pdd_graph["figsize"]["x"], pdd_graph["figsize"]["y"]))
     plt.plot(df.iloc[:, 0], df.iloc[:, 1], marker='o', linestyle='-')
     
     # Customizing the plot
-    plt.xlabel(configJSON["pdd_graph"]["xlabel"])
-    plt.ylabel(configJSON["pdd_graph"]["ylabel"])
-    plt.title(configJSON["pdd_graph"]["title"])
-    plt.grid(configJSON["pdd_graph"]["grid"])
+    plt.xlabel(pdd_graph["xlabel"])
+    plt.ylabel(pdd_graph["ylabel"])
+    plt.title(pdd_graph["title"])
+    plt.grid(pdd_graph["grid"])
 
     # Save the graph
     plt.savefig(output)
     click.echo(f"Graph saved as {output}")
     sys.exit(0)
 
+@click.command()
+@click.argument("reference", type=click.Path(exists=True, file_okay=True, dir_okay=False), required=False)
+@click.argument("evaluated", type=click.Path(exists=True, file_okay=True, dir_okay=False), required=False)
+@click.option("--batch", type=click.Path(exists=True, file_okay=True, dir_okay=False), help="CSV file with columns reference, evaluated and optional gamma_map.")
+@click.option("--dose-difference", type=float, help="Dose difference criterion in percent.")
+@click.option("--distance-to-agreement", type=float, help="Distance to agreement criterion in mm.")
+@click.option("--dose-threshold", type=float, help="Lower dose threshold in percent of the reference maximum.")
+@click.option("--search-radius", type=float, help="Search radius in mm.")
+@click.option("--gamma-cap", type=float, help="Maximum gamma value computed.")
+@click.option("--local/--global", "local", default=None, help="Local or global dose normalization.")
+@click.option("--normalization", type=click.Choice(nel_calc.nel_gamma.normalizations), help="Image normalization before comparison: maximum or central axis.")
+@click.option("--workers", type=int, help="Number of worker threads. All cores if omitted.")
+@click.option("--gamma-map", type=click.Path(file_okay=True, dir_okay=False), help="Gamma map filename (single pair).")
+@click.option("--summary", type=click.Path(file_okay=True, dir_okay=False), help="FileName of summary file.")
+@click.option("--config", type=click.Path(exists=True, file_okay=True), help="Config filename.")
+def analyze_gamma(reference, evaluated, batch, dose_difference, distance_to_agreement, dose_threshold, search_radius, gamma_cap, local, normalization, workers, gamma_map, summary, config):
+    """Compare evaluated planar images against reference images with the gamma index."""
+
+    # Criteria: options first, then config file, then defaults.
+    criteria = nel_calc.nel_gamma.default_criteria.copy()
+    if config:
+        config_gamma = load_config(config).gamma.copy()
+        if normalization is None:
+            normalization = config_gamma.get("normalization")
+        config_gamma.pop("normalization", None)
+        criteria.update(config_gamma)
+    if normalization is None:
+        normalization = nel_calc.nel_gamma.default_normalization
+    options = {
+        "dose_difference": dose_difference,
+        "distance_to_agreement_mm": distance_to_agreement,
+        "dose_threshold": dose_threshold,
+        "search_radius_mm": search_radius,
+        "gamma_cap": gamma_cap,
+        "local": local
+    }
+    criteria.update({key: value for key, value in options.items() if value is not None})
+
+    # Image pairs to compare.
+    # Paths in the batch file are relative to its folder.
+    if batch:
+        if reference or evaluated or gamma_map:
+            raise click.UsageError("Options '--batch' and image arguments or '--gamma-map' cannot be used together.")
+        batch_folder = pathlib.Path(batch).parent
+        with open(batch, "r", encoding = "utf-8") as csvFile:
+            pairs = list()
+            for row in csv.DictReader(csvFile):
+                pair = [row.get("reference"), row.get("evaluated"), row.get("gamma_map")]
+                pairs.append(tuple(str(batch_folder / filename) if filename else None for filename in pair))
+    else:
+        if reference is None or evaluated is None:
+            raise click.BadParameter("Reference and evaluated images are required.")
+        pairs = [(reference, evaluated, gamma_map)]
+
+    # A failed pair is recorded in the summary and the batch goes on.
+    results = list()
+    failures = 0
+    for reference_filename, evaluated_filename, gamma_map_filename in pairs:
+        try:
+            if reference_filename is None or evaluated_filename is None:
+                raise KeyError("Batch row needs reference and evaluated columns.")
+            reference_image = pylinac.core.image.load(reference_filename)
+            evaluated_image = pylinac.core.image.load(evaluated_filename)
+            if abs(reference_image.dpmm - evaluated_image.dpmm) > 1e-6:
+                raise ValueError(f"Images have different pixel sizes: {reference_filename} and {evaluated_filename}.")
+
+            # Like FieldAnalysis: the field must have the highest values, simulated iViewGT images are inverted.
+            # Then both images are grounded and normalized, since measured images are in arbitrary units.
+            reference_image.check_inversion_by_histogram()
+            evaluated_image.check_inversion_by_histogram()
+            reference_array = nel_calc.nel_gamma.NormalizeImage(reference_image.array, normalization)
+            evaluated_array = nel_calc.nel_gamma.NormalizeImage(evaluated_image.array, normalization)
+
+            gamma = nel_calc.nel_gamma.GammaIndex(reference=reference_array, evaluation=evaluated_array,
+                                                  pixel_mm=1 / reference_image.dpmm, workers=workers, **criteria)
+            result = nel_calc.nel_gamma.GammaSummary(gamma)
+        except Exception as error:
+            if not batch:
+                raise
+            failures = failures + 1
+            results.append({"reference": reference_filename, "evaluated": evaluated_filename, "error": str(error)})
+            click.echo(f"{evaluated_filename}: gamma analysis failed: {error}")
+            continue
+
+        result["reference"] = reference_filename
+        result["evaluated"] = evaluated_filename
+        results.append(result)
+        click.echo(f"{evaluated_filename}: gamma pass rate {result['pass_rate']: .2f}% (mean {result['gamma_mean']: .3f}, max {result['gamma_max']: .3f}).")
+
+        if gamma_map_filename:
+            plt.figure()
+            plt.imshow(gamma, cmap="jet", vmin=0, vmax=criteria["gamma_cap"])
+            plt.colorbar(label="Gamma")
+            plt.title(f"Gamma {criteria['dose_difference']}%/{criteria['distance_to_agreement_mm']}mm")
+            plt.savefig(gamma_map_filename)
+            plt.close()
+            click.echo(f"Gamma map saved as {gamma_map_filename}")
+
+    # Create the summary file.
+    # .json
+    if summary:
+        with open(summary, "w", encoding="utf-8") as summaryFile:
+            json.dump({"criteria": criteria, "normalization": normalization, "results": results}, summaryFile, indent=4)
+            click.echo(f"Output file {summary} created.")
+
+    if failures:
+        click.echo(f"Gamma analysis done with {failures} failed pairs.")
+        sys.exit(1)
+    click.echo("Gamma analysis done.")
+    sys.exit(0)
+
+def find_history(history, config):
+    """Find the history database to read: the option, or the one the config file writes to."""
+    if history is None and config:
+        history = load_config(config).GetHistoryFilename()
+    if history is None:
+        raise click.BadParameter("Use --history or a config file with a history section.", param_hint="--history")
+    if not pathlib.Path(history).is_file():
+        raise click.BadParameter(f"History database {history} does not exist.", param_hint="--history")
+    return history
+
+def history_filter_options(function):
+    """Common filter options of the history commands."""
+    options = [
+        click.option("--history", type=click.Path(exists=True, file_okay=True, dir_okay=False), help="History database filename. From the config file if omitted."),
+        click.option("--config", type=click.Path(exists=True, file_okay=True), help="Config filename with a history section."),
+        click.option("--device", type=click.STRING, help="Filter by device name."),
+        click.option("--chamber", type=click.STRING, help="Filter by ionization chamber."),
+        click.option("--energy", type=float, help="Filter by beam energy."),
+        click.option("--command", "command_name", type=click.STRING, help="Filter by the command that recorded the results."),
+        click.option("--from", "date_from", type=click.DateTime(formats=["%Y-%m-%d"]), help="First date (inclusive)."),
+        click.option("--to", "date_to", type=click.DateTime(formats=["%Y-%m-%d"]), help="Last date (inclusive)."),
+    ]
+    for option in reversed(options):
+        function = option(function)
+    return function
+
+@click.command()
+@history_filter_options
+@click.option("--quantity", type=click.STRING, help="Filter by quantity.")
+@click.option("--limit", type=int, help="Maximum number of results.")
+def query(history, config, device, chamber, energy, command_name, date_from, date_to, quantity, limit):
+    """Query results stored in the history database."""
+    history = find_history(history, config)
+    connection = nel_calc.nel_history.OpenHistory(history)
+    try:
+        rows = nel_calc.nel_history.QueryResults(connection, limit=limit,
+                                                 device=device, chamber=chamber, energy=energy, quantity=quantity, command=command_name,
+                                                 date_from=date_from.date().isoformat() if date_from else None,
+                                                 date_to=date_to.date().isoformat() if date_to else None)
+    finally:
+        connection.close()
+
+    csvWriter = csv.writer(sys.stdout, lineterminator="\n")
+    csvWriter.writerow(["date", "device", "chamber", "energy", "command", "source", "quantity", "value"])
+    csvWriter.writerows(rows)
+    sys.exit(0)
+
+@click.command()
+@history_filter_options
+@click.option("--quantity", type=click.STRING, required=True, help="Quantity to trend.")
+@click.option("--period", type=click.Choice(list(nel_calc.nel_history.trend_periods)), default="month", help="Grouping period.")
+def trend(history, config, device, chamber, energy, command_name, date_from, date_to, quantity, period):
+    """Trend a quantity stored in the history database."""
+    history = find_history(history, config)
+    connection = nel_calc.nel_history.OpenHistory(history)
+    try:
+        rows = nel_calc.nel_history.TrendResults(connection, quantity=quantity, period=period,
+                                                 device=device, chamber=chamber, energy=energy, command=command_name,
+                                                 date_from=date_from.date().isoformat() if date_from else None,
+                                                 date_to=date_to.date().isoformat() if date_to else None)
+    finally:
+        connection.close()
+
+    csvWriter = csv.writer(sys.stdout, lineterminator="\n")
+    csvWriter.writerow([period, "device", "count", "average", "min", "max"])
+    csvWriter.writerows(rows)
+    sys.exit(0)
+
 cli.add_command(create_config)
+cli.add_command(check_config)
 cli.add_command(create_image_planar)
 cli.add_command(create_calibration)
 cli.add_command(analyze_preliminary)
 cli.add_command(analyze_image_planar)
 cli.add_command(generate_calibration_report)
 cli.add_command(generate_graph)
+cli.add_command(analyze_gamma)
+cli.add_command(query)
+cli.add_command(trend)
 
 if __name__ == "__main__":
     cli()
@@ -1,4 +1,8 @@
 import json
+import os
+
+import nel_calc.nel_aux
+import nel_calc.nel_gamma
 
 foldernames = {"config": "config", "samples": "samples"}
 
@@ -144,6 +148,15 @@ default_config = {
             "PTP": {
                 "max": 1.2
             }
+        },
+        "gamma": {
+            "dose_difference": 3,
+            "distance_to_agreement_mm": 3,
+            "dose_threshold": 10,
+            "search_radius_mm": 6,
+            "gamma_cap": 2,
+            "local": False,
+            "normalization": "max"
         }
     }
 
@@ -157,6 +170,241 @@ def SaveConfigFile(configfilename: str, config: dict) -> int:
     return 0
 
 
+# Sections every config file must have.
+required_sections = ["quantities", "files", "devices", "images", "pdd_graph", "limits"]
+
+# Values read by the commands, with their type.
+required_values = [
+    (("files", "input_preliminary", "header"), "list"),
+    (("files", "output_preliminary", "header"), "list"),
+    (("files", "output-image-analysis", "preffix"), "string"),
+    (("files", "output-image-analysis", "extension"), "string"),
+    (("images", "symmetry", "FilteredFieldLayer", "field_size_mm"), "pair"),
+    (("images", "symmetry", "GaussianFilterLayer", "sigma_mm"), "number"),
+    (("images", "symmetry", "generate_dicom", "gantry_angle"), "number"),
+    (("pdd_graph", "figsize", "x"), "number"),
+    (("pdd_graph", "figsize", "y"), "number"),
+    (("pdd_graph", "xlabel"), "string"),
+    (("pdd_graph", "ylabel"), "string"),
+    (("pdd_graph", "title"), "string"),
+    (("pdd_graph", "grid"), "bool"),
+    (("limits", "PTP", "max"), "number"),
+]
+
+# Optional sections, with the type of each allowed key and the keys they must have.
+# History is opt-in and not in default_config: a section like {"filename": "history.sqlite", "batch_size": 500}
+# records the results of every analysis in that database, relative to the config file folder.
+optional_sections = {
+    "gamma": {
+        "types": {
+            "dose_difference": "number",
+            "distance_to_agreement_mm": "number",
+            "dose_threshold": "number",
+            "search_radius_mm": "number or null",
+            "gamma_cap": "number",
+            "local": "bool",
+            "normalization": "normalization"
+        },
+        "required": []
+    },
+    "history": {
+        "types": {
+            "filename": "string",
+            "batch_size": "positive int"
+        },
+        "required": ["filename"]
+    }
+}
+
+# Base types supported in the quantities.
+base_types = ["int", "float"]
+
+# Files whose header must only reference known quantities.
+header_files = ["input_preliminary", "output_preliminary"]
+
+# Configs already loaded by this process, by absolute filename, with the mtime and size they were loaded with.
+loaded_configs = dict()
+
+class CompiledConfig:
+    """
+    Config file parsed and validated once, with devices and quantities indexed.
+    """
+    def __init__(self, config: dict, folder: str = None):
+        self.raw = config
+        self.folder = folder
+        self.quantities = config["quantities"]
+        self.files = config["files"]
+        self.devices = config["devices"]
+        self.images = config.get("images", {})
+        self.pdd_graph = config.get("pdd_graph", {})
+        self.limits = config.get("limits", {})
+        self.gamma = config.get("gamma", {})
+        self.history = config.get("history", {})
+
+        # Quantities.
+        self.units = {key: self.quantities[key]["unit"] for key in self.quantities}
+        self.baseTypes = nel_calc.nel_aux.GetBaseTypes(self.quantities)
+
+        # Devices indexed by type and by status.
+        self.devices_by_type = dict()
+        self.devices_by_status = dict()
+        for key in self.devices:
+            device = self.devices[key]
+            self.devices_by_type.setdefault(device["type"], []).append(device)
+            for status in device["status"]:
+                self.devices_by_status.setdefault(status, []).append(device)
+        self.default_devices = {device["type"]: device for device in self.devices_by_status.get("default", [])}
+
+    def GetDefaultDevice(self, deviceType: str) -> dict:
+        """
+        Get the default device of the given type, or None if there is not one.
+        """
+        return self.default_devices.get(deviceType)
+
+    def GetHistoryFilename(self) -> str:
+        """
+        Get the history database filename, relative to the config file folder.
+        Returns None if the config file has no history section.
+        """
+        if not self.history:
+            return None
+        if self.folder is None:
+            return self.history["filename"]
+        return os.path.join(self.folder, self.history["filename"])
+
+    def GetUnits(self, keys: list) -> dict:
+        """
+        Get the units of the given quantities.
+        """
+        return {key: self.units[key] for key in keys}
+
+def GetValue(config: dict, path: tuple):
+    """
+    Get the value at the given path of keys, or None if any key is missing.
+    """
+    value = config
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+def CheckValue(value, valueType: str) -> bool:
+    """
+    Check that the value from the config file has the given type.
+    """
+    isNumber = isinstance(value, (int, float)) and not isinstance(value, bool)
+    if valueType == "number":
+        return isNumber
+    if valueType == "number or null":
+        return value is None or isNumber
+    if valueType == "positive int":
+        return isinstance(value, int) and not isinstance(value, bool) and value > 0
+    if valueType == "string":
+        return isinstance(value, str)
+    if valueType == "bool":
+        return isinstance(value, bool)
+    if valueType == "list":
+        return isinstance(value, list)
+    if valueType == "pair":
+        return isinstance(value, (list, tuple)) and len(value) == 2 and all(CheckValue(item, "number") for item in value)
+    if valueType == "normalization":
+        return value in nel_calc.nel_gamma.normalizations
+    raise ValueError(f"Unknown config value type: {valueType}.")
+
+def ValidateConfig(config: dict) -> list:
+    """
+    Check the config dictionary and return a list with every error found.
+    """
+    if not isinstance(config, dict):
+        return ["Config file must be a JSON object."]
+
+    errors = list()
+    for section in required_sections:
+        if not isinstance(config.get(section), dict):
+            errors.append(f"Missing section: {section}.")
+    if errors:
+        return errors
+
+    for path, valueType in required_values:
+        value = GetValue(config, path)
+        if not CheckValue(value, valueType):
+            errors.append(f"{'.'.join(path)} must be a {valueType}, found: {value!r}.")
+
+    for section, spec in optional_sections.items():
+        if section not in config:
+            continue
+        if not isinstance(config[section], dict):
+            errors.append(f"Section {section} must be an object.")
+            continue
+        for key in spec["required"]:
+            if key not in config[section]:
+                errors.append(f"{section}.{key} is missing.")
+        for key, value in config[section].items():
+            if key not in spec["types"]:
+                errors.append(f"Unknown key {section}.{key}.")
+            elif not CheckValue(value, spec["types"][key]):
+                errors.append(f"{section}.{key} must be a {spec['types'][key]}, found: {value!r}.")
+
+    for key, quantity in config["quantities"].items():
+        if not isinstance(quantity, dict):
+            errors.append(f"Quantity {key} must be an object.")
+            continue
+        if not isinstance(quantity.get("unit"), str):
+            errors.append(f"Quantity {key} has no unit.")
+        if quantity.get("baseType") not in base_types:
+            errors.append(f"Quantity {key} has unknown baseType: {quantity.get('baseType')}.")
+
+    for fileKey in header_files:
+        header = GetValue(config, ("files", fileKey, "header"))
+        for key in header if isinstance(header, list) else []:
+            if key not in config["quantities"]:
+                errors.append(f"Header of {fileKey} has unknown quantity: {key}.")
+
+    defaultTypes = set()
+    for key, device in config["devices"].items():
+        if not isinstance(device, dict):
+            errors.append(f"Device {key} must be an object.")
+            continue
+        for field in ("name", "type"):
+            if not isinstance(device.get(field), str):
+                errors.append(f"Device {key} has no {field}.")
+        if device.get("type") == "epid" and not isinstance(device.get("protocol"), str):
+            errors.append(f"Device {key} has no protocol.")
+        if not isinstance(device.get("status"), list):
+            errors.append(f"Device {key} has no status list.")
+        elif "default" in device["status"] and "type" in device:
+            if device["type"] in defaultTypes:
+                errors.append(f"More than one default device of type: {device['type']}.")
+            defaultTypes.add(device["type"])
+
+    return errors
+
+def CompileConfig(config: dict, folder: str = None) -> CompiledConfig:
+    """
+    Validate the config dictionary and compile it.
+    Raises ValueError with every error found.
+    """
+    errors = ValidateConfig(config)
+    if errors:
+        raise ValueError("\n".join(errors))
+    return CompiledConfig(config, folder)
+
+def LoadConfig(configfilename: str) -> CompiledConfig:
+    """
+    Load the config file with the given name, compiled.
+    Each file is parsed and validated once per process, again only if its mtime or size changes.
+    Invalid JSON or config raises ValueError.
+    """
+    filename = os.path.abspath(configfilename)
+    stat = os.stat(filename)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    if filename in loaded_configs and loaded_configs[filename][0] == stamp:
+        return loaded_configs[filename][1]
+
+    with open(filename, "r", encoding="utf-8") as configFile:
+        config = CompileConfig(json.load(configFile), os.path.dirname(filename))
+    loaded_configs[filename] = (stamp, config)
+    return config
+
 def main():
     return 0
 
@@ -0,0 +1,197 @@
+import os
+import concurrent.futures
+
+import numpy as np
+
+# Default gamma criteria, used when neither options nor config file give them.
+default_criteria = {
+    "dose_difference": 3.0,
+    "distance_to_agreement_mm": 3.0,
+    "dose_threshold": 10.0,
+    "search_radius_mm": None,
+    "gamma_cap": 2.0,
+    "local": False
+}
+
+# Normalizations of the images before the comparison.
+normalizations = ["max", "center"]
+
+default_normalization = "max"
+
+# Half size in pixels of the central region used by the "center" normalization.
+center_half_size = 2
+
+# Minimum number of rows processed by one worker.
+min_band_rows = 64
+
+def NormalizeImage(array: np.ndarray, normalization: str = default_normalization) -> np.ndarray:
+    """
+    Ground the image (minimum to 0) and scale it to 100 at its maximum or at its central axis.
+    The image must not be inverted: the field must have the highest values.
+    """
+    if normalization not in normalizations:
+        raise ValueError(f"Unknown normalization: {normalization}.")
+    array = np.asarray(array, dtype=float)
+    array = array - np.nanmin(array)
+    if normalization == "max":
+        norm_value = np.nanmax(array)
+    else:
+        center_row, center_column = array.shape[0] // 2, array.shape[1] // 2
+        norm_value = np.nanmedian(array[center_row - center_half_size:center_row + center_half_size + 1,
+                                        center_column - center_half_size:center_column + center_half_size + 1])
+    if norm_value <= 0:
+        raise ValueError(f"Cannot normalize image: {normalization} value is not positive.")
+    return array / norm_value * 100
+
+def GetSearchOffsets(pixel_mm: float, distance_to_agreement_mm: float, search_radius_mm: float, gamma_cap: float) -> list:
+    """
+    Get the pixel offsets inside the search radius, sorted by distance.
+    Offsets farther than gamma_cap * distance_to_agreement cannot lower the gamma under the cap, so they are dropped.
+    Returns a list of (dy, dx, squared distance term).
+    """
+    radius_mm = gamma_cap * distance_to_agreement_mm
+    if search_radius_mm is not None:
+        radius_mm = min(radius_mm, search_radius_mm)
+    radius_px = int(radius_mm / pixel_mm)
+
+    offsets = list()
+    for dy in range(-radius_px, radius_px + 1):
+        for dx in range(-radius_px, radius_px + 1):
+            distance_mm = pixel_mm * (dy ** 2 + dx ** 2) ** 0.5
+            if distance_mm <= radius_mm:
+                offsets.append((dy, dx, (distance_mm / distance_to_agreement_mm) ** 2))
+    offsets.sort(key=lambda offset: offset[2])
+    return offsets
+
+def GammaBand(reference: np.ndarray, evaluation_padded: np.ndarray, pad: int, row_start: int, row_stop: int, offsets: list, dose_denominator, gamma_cap: float, threshold_value: float) -> np.ndarray:
+    """
+    Compute the gamma of the reference rows [row_start, row_stop). Pixels under threshold_value are NaN.
+    The evaluation is padded with NaN by pad pixels on every side.
+    Offsets are sorted by distance, so a pixel is dropped from the search once its squared gamma
+    is not above the distance term of the next offsets.
+    """
+    width = reference.shape[1]
+    padded_width = evaluation_padded.shape[1]
+    evaluation_flat = evaluation_padded.ravel()
+
+    reference_band = reference[row_start:row_stop].ravel()
+    gamma2 = np.full(reference_band.size, gamma_cap ** 2)
+    gamma2[reference_band < threshold_value] = np.nan
+
+    # Active pixels: band index and index of the same pixel in the padded evaluation.
+    active = np.flatnonzero(reference_band >= threshold_value)
+    reference_active = reference_band[active]
+    if np.isscalar(dose_denominator):
+        denominator_active = dose_denominator
+    else:
+        denominator_active = dose_denominator[row_start:row_stop].ravel()[active]
+    rows, columns = np.divmod(active, width)
+    padded_active = (rows + row_start + pad) * padded_width + columns + pad
+
+    last_distance_term = None
+    # NaN padding and zero local doses give NaN or inf candidates, which fmin ignores.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for dy, dx, distance_term in offsets:
+            if distance_term != last_distance_term:
+                keep = gamma2[active] > distance_term
+                if not keep.all():
+                    active = active[keep]
+                    padded_active = padded_active[keep]
+                    reference_active = reference_active[keep]
+                    if not np.isscalar(denominator_active):
+                        denominator_active = denominator_active[keep]
+                if active.size == 0:
+                    break
+                last_distance_term = distance_term
+            evaluation_active = evaluation_flat[padded_active + dy * padded_width + dx]
+            candidate = ((evaluation_active - reference_active) / denominator_active) ** 2 + distance_term
+            gamma2[active] = np.fmin(gamma2[active], candidate)
+    return np.sqrt(gamma2).reshape(row_stop - row_start, width)
+
+def GammaIndex(reference: np.ndarray, evaluation: np.ndarray, pixel_mm: float,
+               dose_difference: float = 3.0, distance_to_agreement_mm: float = 3.0, dose_threshold: float = 10.0,
+               search_radius_mm: float = None, gamma_cap: float = 2.0, local: bool = False, workers: int = None) -> np.ndarray:
+    """
+    Compute the 2D gamma index of the evaluation image against the reference image.
+    Both images must be on the same scale, e.g. from NormalizeImage.
+    Dose criteria are percentages of the reference maximum (global) or of each reference pixel (local).
+    Pixels under dose_threshold percent of the reference maximum are NaN. Values are capped at gamma_cap.
+    """
+    reference = np.asarray(reference, dtype=float)
+    evaluation = np.asarray(evaluation, dtype=float)
+    if reference.shape != evaluation.shape:
+        raise ValueError(f"Images have different shapes: {reference.shape} and {evaluation.shape}.")
+
+    reference_max = np.nanmax(reference)
+    if local:
+        dose_denominator = np.abs(reference) * dose_difference / 100
+    else:
+        dose_denominator = reference_max * dose_difference / 100
+
+    threshold_value = reference_max * dose_threshold / 100
+
+    offsets = GetSearchOffsets(pixel_mm=pixel_mm, distance_to_agreement_mm=distance_to_agreement_mm, search_radius_mm=search_radius_mm, gamma_cap=gamma_cap)
+    pad = max(max(abs(dy), abs(dx)) for dy, dx, distance_term in offsets)
+    evaluation_padded = np.pad(evaluation, pad, mode="constant", constant_values=np.nan)
+
+    # Split the rows in bands; numpy releases the GIL so threads run on several cores.
+    if workers is None:
+        workers = os.cpu_count() or 1
+    rows = reference.shape[0]
+    band_rows = max(min_band_rows, -(-rows // workers))
+    bands = [(start, min(start + band_rows, rows)) for start in range(0, rows, band_rows)]
+    gamma = np.empty(reference.shape)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(GammaBand, reference, evaluation_padded, pad, start, stop, offsets, dose_denominator, gamma_cap, threshold_value): (start, stop) for start, stop in bands}
+        for future in concurrent.futures.as_completed(futures):
+            start, stop = futures[future]
+            gamma[start:stop] = future.result()
+    return gamma
+
+def GammaSummary(gamma: np.ndarray) -> dict:
+    """
+    Get the pass rate and statistics of a gamma map.
+    """
+    evaluated = gamma[~np.isnan(gamma)]
+    if evaluated.size == 0:
+        raise ValueError("No pixels above the dose threshold.")
+    return {
+        "pass_rate": float(np.count_nonzero(evaluated <= 1) / evaluated.size * 100),
+        "gamma_mean": float(evaluated.mean()),
+        "gamma_max": float(evaluated.max()),
+        "evaluated_pixels": int(evaluated.size)
+    }
+
+def test():
+    """
+    Numeric checks of the gamma index with known results.
+    """
+    rows, columns = np.mgrid[0:64, 0:64]
+
+    # Identical images pass everywhere with gamma 0.
+    field = 100 * np.exp(-((rows - 32) ** 2 + (columns - 32) ** 2) / 400)
+    summary = GammaSummary(GammaIndex(field, field, pixel_mm=1))
+    assert summary["pass_rate"] == 100 and summary["gamma_max"] == 0, summary
+
+    # Uniform 2% offset with 3%/3 mm: gamma is 2/3 everywhere.
+    flat = np.full((64, 64), 100.0)
+    summary = GammaSummary(GammaIndex(flat, flat * 1.02, pixel_mm=1))
+    assert abs(summary["gamma_max"] - 2 / 3) < 1e-9 and abs(summary["gamma_mean"] - 2 / 3) < 1e-9, summary
+
+    # Steep ramp shifted 1 pixel (1 mm) with 3%/3 mm: gamma is the distance term, 1/3.
+    # The last column has no shifted neighbour and is left out.
+    ramp = 10.0 * columns[:, :10]
+    gamma = GammaIndex(ramp, np.roll(ramp, 1, axis=1), pixel_mm=1, dose_threshold=0)
+    assert np.allclose(gamma[:, 1:-1], 1 / 3), gamma
+
+    # Normalization removes the offset and the scale of the signal.
+    assert np.allclose(NormalizeImage(field * 5 + 7), NormalizeImage(field))
+    assert abs(np.median(NormalizeImage(field, "center")[30:35, 30:35]) - 100) < 1e-9
+
+def main():
+    test()
+    return 0
+
+if __name__ == "__main__":
+    errorCode = main()
+    print(f"Program terminated with errorCode: {errorCode}")
@@ -0,0 +1,141 @@
+import sqlite3
+import datetime
+
+# Schema of the history database.
+# Every result is stored as one row (long format), so new quantities do not need schema changes.
+schema = [
+    """
+    CREATE TABLE IF NOT EXISTS results (
+        id INTEGER PRIMARY KEY,
+        device TEXT NOT NULL,
+        chamber TEXT,
+        energy REAL,
+        date TEXT NOT NULL,
+        command TEXT NOT NULL,
+        source TEXT,
+        quantity TEXT NOT NULL,
+        value REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS results_date ON results (date)",
+    "CREATE INDEX IF NOT EXISTS results_device_date ON results (device, date)",
+    "CREATE INDEX IF NOT EXISTS results_quantity_device_date ON results (quantity, device, date)",
+    "CREATE INDEX IF NOT EXISTS results_quantity_date ON results (quantity, date)",
+    "CREATE INDEX IF NOT EXISTS results_chamber_date ON results (chamber, date)",
+    "CREATE INDEX IF NOT EXISTS results_energy_date ON results (energy, date)",
+    # One value per quantity and recording, so re-running an analysis replaces its results.
+    # Missing chamber, energy and source are NULL, which UNIQUE would treat as all different.
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS results_recording ON results (
+        device, ifnull(chamber, ''), ifnull(energy, ''), date, command, ifnull(source, ''), quantity
+    )
+    """,
+]
+
+# Number of rows inserted per transaction.
+default_batch_size = 500
+
+def OpenHistory(filename: str) -> sqlite3.Connection:
+    """
+    Open (or create) the history database with the given name.
+    """
+    connection = sqlite3.connect(filename)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    with connection:
+        for statement in schema:
+            connection.execute(statement)
+    return connection
+
+def Results2Rows(results: dict, device: str, chamber: str, energy: float, date: str, command: str, source: str) -> list:
+    """
+    Convert a dictionary of results into rows of the history database.
+    Values that are not numbers are skipped.
+    """
+    rows = list()
+    for quantity in results:
+        value = results[quantity]
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        rows.append((device, chamber, energy, date, command, source, quantity, float(value)))
+    return rows
+
+def AppendResults(connection: sqlite3.Connection, rows: list, batch_size: int = default_batch_size) -> int:
+    """
+    Insert the rows into the history database in batched transactions.
+    A row already recorded with the same device, chamber, energy, date, command, source and quantity is replaced.
+    Returns the number of inserted rows.
+    """
+    statement = "INSERT OR REPLACE INTO results (device, chamber, energy, date, command, source, quantity, value) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    for start in range(0, len(rows), batch_size):
+        with connection:
+            connection.executemany(statement, rows[start:start + batch_size])
+    return len(rows)
+
+def RecordResults(filename: str, results: dict, device: str, chamber: str, energy: float, date: str, command: str, source: str, batch_size: int = default_batch_size) -> int:
+    """
+    Append the results of a command to the history database with the given name.
+    """
+    if date is None:
+        date = datetime.date.today().isoformat()
+    rows = Results2Rows(results=results, device=device, chamber=chamber, energy=energy, date=date, command=command, source=source)
+    connection = OpenHistory(filename)
+    try:
+        count = AppendResults(connection, rows, batch_size=batch_size)
+    finally:
+        connection.close()
+    return count
+
+def BuildFilter(device: str = None, chamber: str = None, energy: float = None, quantity: str = None, command: str = None, date_from: str = None, date_to: str = None) -> tuple:
+    """
+    Build the WHERE clause and its parameters for the given filters.
+    Dates are compared as ISO 8601 strings, so both bounds are inclusive.
+    """
+    conditions = list()
+    parameters = list()
+    for column, value in (("quantity", quantity), ("device", device), ("chamber", chamber), ("energy", energy), ("command", command)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            parameters.append(value)
+    if date_from is not None:
+        conditions.append("date >= ?")
+        parameters.append(date_from)
+    if date_to is not None:
+        conditions.append("date <= ?")
+        parameters.append(date_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, parameters
+
+def QueryResults(connection: sqlite3.Connection, limit: int = None, **filters) -> list:
+    """
+    Get the stored results that match the filters, ordered by date.
+    """
+    where, parameters = BuildFilter(**filters)
+    statement = f"SELECT date, device, chamber, energy, command, source, quantity, value FROM results {where} ORDER BY date, id"
+    if limit is not None:
+        statement = f"{statement} LIMIT ?"
+        parameters.append(limit)
+    return connection.execute(statement, parameters).fetchall()
+
+# Grouping of the trend per period, as SQLite date prefixes.
+trend_periods = {"day": 10, "month": 7, "year": 4}
+
+def TrendResults(connection: sqlite3.Connection, quantity: str, period: str = "month", **filters) -> list:
+    """
+    Get count, average, minimum and maximum of a quantity per device and period.
+    """
+    if period not in trend_periods:
+        raise ValueError(f"Unknown trend period: {period}.")
+    where, parameters = BuildFilter(quantity=quantity, **filters)
+    statement = (
+        f"SELECT substr(date, 1, {trend_periods[period]}) AS period, device, COUNT(value), AVG(value), MIN(value), MAX(value) "
+        f"FROM results {where} GROUP BY period, device ORDER BY period, device"
+    )
+    return connection.execute(statement, parameters).fetchall()
+
+def main():
+    return 0
+
+if __name__ == "__main__":
+    errorCode = main()
+    print(f"Program terminated with errorCode: {errorCode}")